@@ -52,5 +52,6 @@ def main():
             if result == 19690720:
                 return i * 100 + j;
 
-answer = main()
-print(f"Answer is {answer}")
+if __name__ == '__main__':
+    answer = main()
+    print(f"Answer is {answer}")
@@ -3,7 +3,6 @@
 
 https://adventofcode.com/2019/day/23
 
-
 See program.dat for full data.
 
 Author: Tim Behrendsen
@@ -12,313 +11,221 @@ Author: Tim Behrendsen
 fn = 'program.dat'
 
 import re
-import queue
+import os
+import sys
+import multiprocessing
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from intcode import IntCode, load_program
 
-POS_MODE = 0
-IMM_MODE = 1
-REL_MODE = 2
-DEBUG = False
 VISUALIZE = False
 VIDEO_FEED = False
 
-inst_list = { 1: 'SUM', 2: 'MULT', 3: 'INP', 4: 'OUT', 5: 'JT', 6: 'JF', 7: 'LT', 8: 'EQU', 9: 'REL', 99: 'END' }
-lengths = { 'SUM': 3, 'MULT': 3, 'INP': 1, 'OUT': 1, 'JT': 2, 'JF': 2, 'LT': 3, 'EQU': 3, 'REL': 1, 'END': 0 }
-
-class IntCode:
-    # yield_mode:
-    #       False = Run until END opcode
-    #       True  = Return result when output written to, continue when called again
-    # no_inp_block:
-    #       False = Stop if no input
-    #       True  = Return -1 in input instruction, if no input
-    def __init__(self, yield_mode = False, no_inp_block = False):
-        self.memory = { }
-        self.rel_base = 0
-        self.yield_mode = yield_mode
-        self.input_queue = queue.Queue()
-        self.no_inp_block = no_inp_block
-
-    # Load program into memory and reset computer
-    def load(self, program):
-        self.memory = { int(i): int(value) for i, value in enumerate(program) }
-        self.base_memory = self.memory.copy()
-        self.pc = 0
-        self.rel_base = 0
-
-    # Reset the program to base state
-    def reset(self):
-        self.pc = 0
-        self.rel_base = 0
-        for i, val in self.base_memory.items():
-            self.memory[i] = val
-
-    # Save state of program
-    def save_state(self):
-        # Return list of differences from current state to saved state
-        diff = [ (i, val) for i, val in self.memory.items() \
-            if i not in self.base_memory or self.base_memory.get(i, 0) != val ]
-
-        return [ self.rel_base, self.pc, diff ]
-
-    def restore_state(self, state):
-        self.rel_base = state[0]
-        self.pc = state[1]
-        for i, val in self.base_memory.items():
-            self.memory[i] = val
-
-        for diff in state[2]:
-            self.memory[diff[0]] = diff[1]
-        return
-
-    # Fetch a memory location
-    def fetch(self, addr):
-        if DEBUG:
-            print(f"    Fetch [{addr}] is {self.memory.get(addr, 0)}")
-        if addr < 0:
-            raise Exception("Invalid fetch: {addr}")
-        return self.memory.get(addr, 0)
-
-    # Fetch a memory location with mode
-    def fetch_val(self, mode, val):
-        if mode == POS_MODE:            # Position mode, val = memory address
-            return self.fetch(val)
-        if mode == IMM_MODE:            # Immediate mode, val = actual value
-            return val
-        if mode == REL_MODE:            # Relative mode, val = offset from relative base
-            return self.fetch(val+self.rel_base)
-        raise Exception("invalid mode {mode}")
-
-    # Store at memory location
-    def store(self, addr, val):
-        self.memory[addr] = val
-        if DEBUG:
-            print(f"    Write to [{addr}] <- {val}")
-
-    # Store at memory location with mode
-    def store_val(self, mode, addr, val):
-        if mode == POS_MODE:            # Position mode, val = memory address
-            pass
-        elif mode == REL_MODE:          # Relative mode, val = offset from relative base
-            addr = addr + self.rel_base
-        else:
-            raise Exception("invalid mode {mode}")
-
-        self.store(addr, val)
-        return addr
-
-    def add_input(self, n):
-        self.input_queue.put(n)
-
-    def add_input_str(self, s):
-        for c in s:
-            self.input_queue.put(ord(c))
-
-    def inp_len(self):
-        return self.input_queue.qsize()
-
-    def get_input(self):
-        if DEBUG:
-            print(f"    get_input: len = {self.inp_len()}")
-        if self.no_inp_block and self.inp_len() == 0:
-            return -1
-        return self.input_queue.get()
-
-    # Run program
-    def run(self):
-        out_list = []
+NUM_MACHINES = 50
+MAX_POLLS = 100
 
-        while True:
-            op = self.memory.get(self.pc)
-            inst = op % 100;
-            modes = [ (op // 100) % 10, (op // 1000) % 10, op // 10000 ]
-            params = [ self.memory.get(self.pc+i+1, 0) for i in range(lengths[inst_list[inst]]) ]
-
-            if DEBUG:
-                print(f"{self.pc} {inst_list[inst]} ({op} / {modes}): {params}")
-
-            if inst == 1:             # sum
-                n1 = self.fetch_val(modes[0], params[0])
-                n2 = self.fetch_val(modes[1], params[1])
-                n = n1 + n2
-                addr = self.store_val(modes[2], params[2], n)
-                if DEBUG:
-                    print(f"    SUM: {n1} + {n2} = {n}, store at [{addr}]")
-                self.pc += 4
-                pass
-
-            elif inst == 2:           # mult
-                n1 = self.fetch_val(modes[0], params[0])
-                n2 = self.fetch_val(modes[1], params[1])
-                n = n1 * n2
-                addr = self.store_val(modes[2], params[2], n)
-                if DEBUG:
-                    print(f"    MULT: {n1} * {n2} = {n}, store at [{addr}]")
-                self.pc += 4
-                pass
-
-            elif inst == 3:           # input
-                # If no block mode and no current input, store -1 and yield
-                if self.no_inp_block and self.inp_len() == 0:
-                    addr = self.store_val(modes[0], params[0], -1)
-                    self.pc += 2
-                    return 0, out_list
-
-                n = self.get_input()
-                addr = self.store_val(modes[0], params[0], n)
-                if DEBUG:
-                    print(f"    INP: {n} store at [{addr}]")
-                self.pc += 2
-
-            elif inst == 4:           # output
-                n = self.fetch_val(modes[0], params[0])
-                out_list.append(n)
-                if DEBUG:
-                    print(f"    OUT: {n} write from {params[0]}")
-                self.pc += 2
-                if self.yield_mode:
-                    return 0, out_list
-
-            elif inst == 5:           # Jump-if-true
-                n = self.fetch_val(modes[0], params[0])
-                if n != 0:
-                    self.pc = self.fetch_val(modes[1], params[1])
-                    if DEBUG:
-                        print(f"    JT: {n}, jumping to {self.pc}")
-                else:
-                    if DEBUG:
-                        print(f"    JT: {n}, NO JUMP")
-                    self.pc += 3
-
-            elif inst == 6:           # Jump-if-false
-                n = self.fetch_val(modes[0], params[0])
-                if n == 0:
-                    self.pc = self.fetch_val(modes[1], params[1])
-                    if DEBUG:
-                        print(f"    JF: {n}, jumping to {self.pc}")
-                else:
-                    if DEBUG:
-                        print(f"    JF: {n}, NO JUMP")
-                    self.pc += 3
-
-            elif inst == 7:           # less-than
-                n1 = self.fetch_val(modes[0], params[0])
-                n2 = self.fetch_val(modes[1], params[1])
-                addr = self.store_val(modes[2], params[2], 0 + (n1 < n2))
-                if DEBUG:
-                    print(f"    LT: {n1} < {n2} = {n1 < n2}, store at [{addr}]")
-                self.pc += 4
-
-            elif inst == 8:           # Equal
-                n1 = self.fetch_val(modes[0], params[0])
-                n2 = self.fetch_val(modes[1], params[1])
-                addr = self.store_val(modes[2], params[2], 0 + (n1 == n2))
-                if DEBUG:
-                    print(f"    EQ: {n1} == {n2}, is {n1 == n2}, store at [{addr}]")
-                self.pc += 4
-
-            elif inst == 9:           # Set relative base
-                last = self.rel_base
-                self.rel_base += self.fetch_val(modes[0], params[0])
-                if DEBUG:
-                    print(f"    REL: Relative base set from {last} to {self.rel_base}")
-                self.pc += 2
-
-            elif inst == 99:
-                break
-            
-            else:
-                raise Exception(f"Invalid op {inst}");
-
-        return 1, out_list
-
-def allocate_network(program):
-    # Allocate 50 machines
-    network = []
-    for addr in range(50):
-        machine = IntCode(yield_mode=True, no_inp_block=True)
+# Number of worker processes to split the network across (0 = run it all
+# in this process)
+SHARDS = 0
+
+# Allocate a machine for each network address in addrs
+def allocate_network(program, addrs):
+    network = {}
+    for addr in addrs:
+        machine = IntCode(no_inp_block=True, jit=True)
         machine.load(program)
-        network.append(machine)
+        network[addr] = machine
 
         # First input is "network address"
         machine.add_input(addr)
-        stopped, out_list = machine.run()
 
     return network
 
+# Run machine until the machine sees it's in its idle loop (quiescent),
+# polling for input without getting anywhere. Returns (packets, idle),
+# where packets are the (dest, x, y) packets sent and idle is False if
+# it didn't settle within MAX_POLLS polls.
+def run_machine(machine):
+    out = []
+    for poll in range(MAX_POLLS):
+        stopped, out_list = machine.run()
+        out.extend(out_list)
+        if machine.quiescent:
+            break
+
+    packets = [ tuple(out[i:i+3]) for i in range(0, len(out), 3) ]
+    return packets, machine.quiescent
+
+# Run the network until every machine is idle with no packets pending
+#   Only machines in ready are run: ones with packets waiting, or that
+#   haven't settled yet. Packets for addresses outside the network go to
+#   send(dest, x, y); returns True as soon as that returns True, False
+#   once the network is idle.
+def run_network(network, ready, send):
+    queued = set(ready)
+
+    def wake(addr):
+        if addr not in queued:
+            queued.add(addr)
+            ready.append(addr)
+
+    while len(ready) > 0:
+        addr = ready.popleft()
+        queued.discard(addr)
+        packets, idle = run_machine(network[addr])
+        if not idle:
+            wake(addr)
+
+        for dest_addr, x, y in packets:
+            if dest_addr in network:
+                network[dest_addr].add_input_list((x, y))
+                wake(dest_addr)
+            elif send(dest_addr, x, y):
+                return True
+
+    return False
+
+# Simulate the network in this process
+#   Packets to 255 go to nat(x, y), which stops the simulation by
+#   returning True. When the network is idle, on_idle() returns the packet
+#   for address 0, or None to stop.
+def simulate(program, nat, on_idle):
+    network = allocate_network(program, range(NUM_MACHINES))
+    ready = deque(network)
+
+    def send(dest_addr, x, y):
+        return nat(x, y)
+
+    while not run_network(network, ready, send):
+        packet = on_idle()
+        if packet is None:
+            return
+        network[0].add_input_list(packet)
+        ready.append(0)
+
+# Worker process for simulate_sharded(), running the machines in addrs
+#   Each epoch it receives the packets for its machines, runs them until
+#   they are all idle, and sends back the packets for other addresses.
+def shard_worker(conn, program, addrs):
+    network = allocate_network(program, addrs)
+    ready = deque(network)
+
+    while True:
+        packets = conn.recv()
+        if packets is None:
+            break
+        for dest_addr, x, y in packets:
+            network[dest_addr].add_input_list((x, y))
+            ready.append(dest_addr)
+
+        outbound = []
+        def send(dest_addr, x, y):
+            outbound.append((dest_addr, x, y))
+            return False
+
+        run_network(network, ready, send)
+        conn.send(outbound)
+
+# Simulate the network split across SHARDS worker processes, same as
+# simulate()
+#   The coordinator runs in epochs: it hands every worker its packets,
+#   waits for all of them to reach their own idle state, and routes the
+#   packets they sent. Packets to 255 go to the NAT here. The network is
+#   idle when an epoch ends with no packets to route.
+def simulate_sharded(program, nat, on_idle):
+    conns = []
+    workers = []
+    for shard in range(SHARDS):
+        conn, worker_conn = multiprocessing.Pipe()
+        addrs = range(shard, NUM_MACHINES, SHARDS)
+        worker = multiprocessing.Process(target=shard_worker, args=(worker_conn, program, addrs))
+        worker.start()
+        conns.append(conn)
+        workers.append(worker)
+
+    try:
+        pending = []
+        while True:
+            # Send out this epoch's packets, then wait for every shard
+            inbound = [ [] for shard in range(SHARDS) ]
+            for packet in pending:
+                inbound[packet[0] % SHARDS].append(packet)
+            for conn, packets in zip(conns, inbound):
+                conn.send(packets)
+
+            pending = []
+            for conn in conns:
+                for dest_addr, x, y in conn.recv():
+                    if dest_addr != 255:
+                        pending.append((dest_addr, x, y))
+                    elif nat(x, y):
+                        return
+
+            if len(pending) == 0:
+                packet = on_idle()
+                if packet is None:
+                    return
+                pending.append((0, *packet))
+
+    finally:
+        for conn in conns:
+            conn.send(None)
+        for worker in workers:
+            worker.join()
+
 # Part 1
-def part1(program):
-    network = allocate_network(program)
+def part1(program, simulate):
+    result = []
 
     # Continue until something sent to address "255"
-    while True:
-        for addr in range(50):
-            machine = network[addr]
-            stopped, out_list = machine.run()
-
-            # See if machine output a message to send to another machine
-            if len(out_list) > 0:
-                dest_addr = out_list[0]             # Address
-                stopped, out_list = machine.run()
-                x = out_list[0]                     # X parameter
-                stopped, out_list = machine.run()
-                y = out_list[0]                     # Y parameter
-                if dest_addr == 255:
-                    return y
-                # Send to destination
-                network[dest_addr].add_input(x)
-                network[dest_addr].add_input(y)
-
-    return 0
+    def nat(x, y):
+        result.append(y)
+        return True
 
-# Part 2
-def part2(program):
-    network = allocate_network(program)
+    def on_idle():
+        return None
 
-    last_y = -99
-    nat = (-1, -1)
+    simulate(program, nat, on_idle)
+    return result[0]
 
-    # Continue until same "Y" sent to 255 twice
-    while True:
-        idle = True
-        for addr in range(50):
-            machine = network[addr]
-            stopped, out_list = machine.run()
-            if len(out_list) > 0:
-                dest_addr = out_list[0]
-                stopped, out_list = machine.run()
-                x = out_list[0]
-                stopped, out_list = machine.run()
-                y = out_list[0]
-
-                # Write to NAT
-                if dest_addr == 255:
-                    nat = (x, y)
-                else:
-                    network[dest_addr].add_input(x)
-                    network[dest_addr].add_input(y)
-                    idle = False
-
-        if idle:
-            if nat[1] == last_y:
-                return last_y
-            network[0].add_input(nat[0])
-            network[0].add_input(nat[1])
-            last_y = nat[1]
-
-    return 0
+# Part 2
+def part2(program, simulate):
+    last_y = -99
+    nat_packet = (-1, -1)
+    result = []
+
+    def nat(x, y):
+        nonlocal nat_packet
+        nat_packet = (x, y)
+        return False
+
+    # Network is idle, so NAT sends its last packet to address 0.
+    # Continue until same "Y" sent twice in a row.
+    def on_idle():
+        nonlocal last_y
+        if nat_packet[1] == last_y:
+            result.append(last_y)
+            return None
+        last_y = nat_packet[1]
+        return nat_packet
+
+    simulate(program, nat, on_idle)
+    return result[0]
 
 def main():
     # Read in program instructions
-    program = []
-    with open(fn, 'r') as file:
-        program = [ int(n) for n in file.readline().rstrip("\n").split(',') ]
+    program = load_program(fn)
+
+    sim = simulate_sharded if SHARDS > 0 else simulate
 
-    answer = part1(program)
+    answer = part1(program, sim)
     print(f"Part 1: answer = {answer}")
 
-    answer = part2(program)
+    answer = part2(program, sim)
     print(f"Part 2: answer = {answer}")
 
     return
 
-main()
+if __name__ == '__main__':
+    main()
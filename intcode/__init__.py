@@ -0,0 +1,24 @@
+"""Shared "intcode" computer used by the Advent of Code 2019 solutions
+
+The IntCode machine first shows up on Day 2 and grows over Days 5, 7 and 9,
+after which every odd day from 9 to 25 runs an IntCode program. This package
+holds the one copy of the computer that the day solvers import.
+
+AsyncIntCode isn't imported here, since loading asyncio would slow down
+the start of every solver; import it from intcode.async_machine.
+
+Author: Tim Behrendsen
+"""
+
+from .machine import IntCode, POS_MODE, IMM_MODE, REL_MODE, inst_list, lengths
+from .batch import run_batch, run_many
+from .ascii import AsciiChannel
+from .loader import load_program
+from .disasm import analyze
+from .profiler import Profile
+from .memo import Memo, RunCache
+from .backends import BACKENDS, new_machine
+
+__all__ = [ 'IntCode', 'POS_MODE', 'IMM_MODE', 'REL_MODE', 'inst_list', 'lengths', 'run_batch', 'run_many',
+    'AsciiChannel', 'load_program', 'analyze', 'Profile',
+    'Memo', 'RunCache', 'BACKENDS', 'new_machine' ]
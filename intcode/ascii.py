@@ -0,0 +1,78 @@
+"""ASCII channel for IntCode programs that talk in text
+
+Days 17, 21 and 25 run programs that print lines of ASCII text and read
+commands. AsciiChannel wraps a machine: each run's output is packed into a
+bytes object in one call, and complete lines come back as memoryview slices
+of it, so no Python object is made per character. Commands go in as one
+str or bytes.
+
+Output values outside 0..255 (Day 21's hull damage, for example) can't be
+text, and are collected in values instead.
+
+Author: Tim Behrendsen
+"""
+
+class AsciiChannel:
+    def __init__(self, machine):
+        self.machine = machine
+        self.data = b''
+        self.view = memoryview(self.data)
+        self.pos = 0
+        self.stopped = 0
+        self.values = []
+
+    # Drop unread output, after the machine is reset or restored
+    def clear(self):
+        self.data = b''
+        self.view = memoryview(self.data)
+        self.pos = 0
+        self.stopped = 0
+
+    # Send a command (str or bytes) as input
+    def send(self, cmd):
+        if isinstance(cmd, str):
+            cmd = cmd.encode('ascii')
+        self.machine.add_input_list(cmd)
+
+    # Run the machine until it ends or waits for input, adding its output
+    # to the unread data. Returns False if there was no output.
+    def fill(self):
+        stopped, out_list = self.machine.run()
+        self.stopped = stopped
+        if len(out_list) == 0:
+            return False
+
+        if min(out_list) < 0 or max(out_list) > 255:
+            self.values.extend([ n for n in out_list if not 0 <= n <= 255 ])
+            out_list = [ n for n in out_list if 0 <= n <= 255 ]
+
+        # Keep only the unread part of the old data. Lines already handed
+        # out are slices of the old bytes object, which stays valid.
+        self.data = self.data[self.pos:] + bytes(out_list)
+        self.view = memoryview(self.data)
+        self.pos = 0
+        return True
+
+    # Next line of output, without the newline, as a memoryview. Returns
+    # None if the program ends or waits for input first.
+    def read_line(self):
+        while True:
+            end = self.data.find(b'\n', self.pos)
+            if end >= 0:
+                line = self.view[self.pos:end]
+                self.pos = end + 1
+                return line
+            if self.stopped or not self.fill():
+                return None
+
+    # Same as read_line(), as a str
+    def read_str(self):
+        line = self.read_line()
+        return None if line is None else str(line, 'ascii')
+
+    # All lines until the program ends or waits for input, as str
+    def read_all(self):
+        lines = []
+        while (line := self.read_str()) is not None:
+            lines.append(line)
+        return lines
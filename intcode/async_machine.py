@@ -0,0 +1,58 @@
+"""asyncio version of the IntCode computer
+
+AsyncIntCode reads input from an asyncio.Queue and writes output to one, so
+networks of machines, like the Day 7 amplifier loop or the Day 23 NICs,
+can be wired together with queues and run as coroutines:
+
+    a = AsyncIntCode()
+    b = AsyncIntCode(inp=a.out)
+    ...
+    await asyncio.gather(a.run_async(), b.run_async())
+
+A machine waiting for input awaits its input queue, so the event loop only
+runs machines that have something to do. A machine that computes for a
+long time gives up control every budget jumps (see IntCode.run).
+
+Author: Tim Behrendsen
+"""
+
+import asyncio
+
+from .machine import IntCode
+
+BUDGET = 10000
+
+class AsyncIntCode(IntCode):
+    # inp, out:
+    #       asyncio.Queue to read input from and write output to; a new
+    #       queue if not given
+    # budget:
+    #       Jumps to run before letting other tasks run
+    # Other arguments are passed to IntCode.
+    def __init__(self, inp = None, out = None, budget = BUDGET, **kwargs):
+        super().__init__(**kwargs)
+        self.inp = inp if inp is not None else asyncio.Queue()
+        self.out = out if out is not None else asyncio.Queue()
+        self.budget = budget
+
+    # True if the program is stopped at INP with no input
+    def waiting_for_input(self):
+        return self.inp_len() == 0 and self.fetch(self.pc) % 100 == 3
+
+    # Run program until END. Returns the last output value, or None.
+    async def run_async(self):
+        last = None
+        while True:
+            stopped, out_list = self.run(budget=self.budget)
+            for n in out_list:
+                await self.out.put(n)
+                last = n
+            if stopped:
+                return last
+
+            if self.waiting_for_input():
+                self.add_input(await self.inp.get())
+                while not self.inp.empty():
+                    self.add_input(self.inp.get_nowait())
+            else:
+                await asyncio.sleep(0)
@@ -0,0 +1,36 @@
+"""IntCode backends
+
+The computer has several ways of running a program, picked by constructor
+options. A backend names one of them, so solvers, the suite and the
+benchmark can ask for one by name:
+
+    traced  Traced interpreter with the trace thrown away. Goes through
+            fetch_val() and store_val() for every operand, the plainest
+            way to run a program, so it's the reference.
+    plain   Fast interpreter, one instruction at a time
+    fused   Fast interpreter with superinstructions (the default)
+    jit     Basic blocks compiled into Python functions
+
+Author: Tim Behrendsen
+"""
+
+from .machine import IntCode
+
+def ignore_trace(line):
+    pass
+
+# Backend name -> IntCode constructor options
+BACKENDS = {
+    'traced': { 'trace': ignore_trace },
+    'plain': { 'fuse': False },
+    'fused': { },
+    'jit': { 'jit': True },
+}
+
+DEFAULT_BACKEND = 'fused'
+
+# New machine using backend, with any other constructor options
+def new_machine(backend = DEFAULT_BACKEND, **kwargs):
+    if backend not in BACKENDS:
+        raise Exception(f"Unknown backend {backend}")
+    return IntCode(**BACKENDS[backend], **kwargs)
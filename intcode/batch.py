@@ -0,0 +1,100 @@
+"""Batch runs of one IntCode program over many independent inputs
+
+Puzzles like Day 19 run the same program once per input vector. Loading a
+fresh machine for each run would decode (and in jit mode, compile) the
+program every time. run_batch() instead keeps one machine and resets it
+between runs, so the decoded instructions and compiled blocks stay warm
+and each reset only restores the memory pages the last run wrote.
+
+run_many() does the same across a pool of worker processes. Each worker
+gets the program once, when it starts, and then runs chunks of input sets
+on its own machine.
+
+An input set can also be a (patches, inputs) pair, where patches is a dict
+of address -> value stored into memory before the run starts, and with
+cells, a run returns the values of those memory cells when it ends instead
+of its outputs. The suite searches Day 2's noun and verb that way:
+
+    runs = [ ({ 1: noun, 2: verb }, ()) for noun in ... for verb in ... ]
+    results = run_batch(program, runs, cells=(0,))
+
+Author: Tim Behrendsen
+"""
+
+from .machine import IntCode
+
+CHUNK_SIZE = 100
+
+# Machine and result cells of a run_many() worker process, set up by
+# init_worker()
+worker_machine = None
+worker_cells = None
+
+# Run the program loaded in machine once with inputs, returning its outputs
+#   inputs can be a (patches, inputs) pair, to store patches (address ->
+#   value) before the run. If cells is given, returns the list of values
+#   in those memory cells after the run instead.
+def run_inputs(machine, inputs, cells = None):
+    machine.reset()
+    if inputs and isinstance(inputs[0], dict):
+        patches, inputs = inputs
+        for addr, val in patches.items():
+            machine.store(addr, val)
+    for n in inputs:
+        machine.add_input(n)
+    stopped, out_list = machine.run()
+    if cells is not None:
+        return [ machine.fetch(addr) for addr in cells ]
+    return out_list
+
+# Run program once for each input set in input_sets
+#   Each run starts from the loaded program, gets its input set as input
+#   and runs until END. Returns the list of outputs (or cells, see
+#   run_inputs()) of each run, in order. If stop is given, stops after the
+#   first run that stop(result) returns True for, as run_many() does.
+def run_batch(program, input_sets, jit = True, stop = None, cells = None):
+    machine = IntCode(jit=jit)
+    machine.load(program)
+    results = []
+    for inputs in input_sets:
+        result = run_inputs(machine, inputs, cells)
+        results.append(result)
+        if stop is not None and stop(result):
+            break
+    return results
+
+def init_worker(program, jit, cells):
+    global worker_machine, worker_cells
+    worker_machine = IntCode(jit=jit)
+    worker_machine.load(program)
+    worker_cells = cells
+
+def run_chunk(input_sets):
+    return [ run_inputs(worker_machine, inputs, worker_cells) for inputs in input_sets ]
+
+# Run program once for each input set, like run_batch(), on workers
+# processes (default: one per CPU)
+#   Input sets are sent to the workers in chunks of chunk_size, and the
+#   results come back in order. If stop is given, stop(result) is called
+#   on each run's result in order, and at the first run it returns True
+#   for, the remaining work is cancelled and the results up to and
+#   including that run are returned.
+def run_many(program, input_sets, workers = None, stop = None, chunk_size = CHUNK_SIZE, jit = True,
+        cells = None):
+    # Imported here, so solvers that don't use a pool don't pay for loading
+    # it on every start
+    import multiprocessing
+
+    input_sets = list(input_sets)
+    chunks = [ input_sets[i:i+chunk_size] for i in range(0, len(input_sets), chunk_size) ]
+
+    results = []
+    with multiprocessing.Pool(workers, init_worker, (program, jit, cells)) as pool:
+        for chunk_results in pool.imap(run_chunk, chunks):
+            for result in chunk_results:
+                results.append(result)
+                if stop is not None and stop(result):
+                    # Leaving the with block terminates the pool
+                    return results
+
+    return results
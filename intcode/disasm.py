@@ -0,0 +1,218 @@
+"""IntCode disassembler and control-flow graph
+
+analyze(program) lifts a program into basic blocks and a control-flow
+graph, by following control flow from pc 0 (recursive traversal). Jumps
+with an immediate target give static edges. Jumps through memory or the
+relative base, which is how compiled IntCode returns from functions, have
+no static target; the address after each static jump is then also tried
+as an entry, since that is where such a call returns to. Targets that
+are only known at run time (Day 23 patches a jump table, for example) can
+be passed in as extra entries, such as the pcs in the decode cache of a
+machine that ran the program.
+
+Everything reached this way is code, the rest is data. Stores to a fixed
+address inside the code are listed as patches (self-modifying code), and
+edges back to a block that is still being walked are loops.
+
+Results are cached per program, so asking again is free.
+
+Author: Tim Behrendsen
+"""
+
+from .machine import IMM_MODE, REL_MODE, inst_list, lengths, write_insts
+
+# Analysis results, keyed by program contents
+analysis_cache = { }
+
+class BasicBlock:
+    def __init__(self, start):
+        self.start = start
+        self.end = start            # Address after the last instruction
+        self.insts = []             # (pc, inst, modes, params)
+        self.succs = []             # Start addresses of successors
+        self.preds = []
+        self.indirect = False       # Ends with a jump with no static target
+
+class Analysis:
+    def __init__(self, program):
+        self.program = program
+        self.blocks = { }           # Start address -> BasicBlock
+        self.code = set()           # Addresses covered by instructions
+        self.patches = { }          # Patched code address -> pcs of stores
+        self.loops = []             # (from block, to block) back edges
+
+    # Ranges (start, end, kind) covering the program, kind 'code' or 'data'
+    def regions(self):
+        regions = []
+        for addr in range(len(self.program)):
+            kind = 'code' if addr in self.code else 'data'
+            if regions and regions[-1][2] == kind:
+                regions[-1] = (regions[-1][0], addr+1, kind)
+            else:
+                regions.append((addr, addr+1, kind))
+        return regions
+
+    # Text listing of the program, by block and data region
+    def listing(self):
+        lines = []
+        for start, end, kind in self.regions():
+            if kind == 'data':
+                values = ','.join(str(v) for v in self.program[start:end])
+                lines.append(f"{start:5}: DATA {values}")
+                continue
+
+            for block_start in sorted(b for b in self.blocks if start <= b < end):
+                block = self.blocks[block_start]
+                succs = ', '.join(str(s) for s in block.succs)
+                if block.indirect:
+                    succs += ', ?' if succs else '?'
+                lines.append(f"block {block_start} -> {succs or 'END'}")
+                for pc, inst, modes, params in block.insts:
+                    operands = ', '.join(format_operand(m, p) for m, p in zip(modes, params))
+                    patched = '  ; patched' if any(a in self.patches for a in range(pc, pc+len(params)+1)) else ''
+                    lines.append(f"{pc:5}: {inst_list[inst]:4} {operands}{patched}")
+        return lines
+
+def format_operand(mode, param):
+    if mode == IMM_MODE:
+        return str(param)
+    if mode == REL_MODE:
+        return f"[rb{param:+}]"
+    return f"[{param}]"
+
+# Decode the instruction at pc of program, without a machine. Returns
+# None if there is no valid instruction there.
+def decode_at(program, pc):
+    if pc < 0 or pc >= len(program):
+        return None
+    op = program[pc]
+    inst = op % 100
+    if op < 0 or inst not in inst_list:
+        return None
+    length = lengths[inst_list[inst]] + 1
+    if pc + length > len(program):
+        return None
+    modes = ( (op // 100) % 10, (op // 1000) % 10, op // 10000 )
+    if any(m > REL_MODE for m in modes):
+        return None
+    if inst in write_insts and modes[length-2] == IMM_MODE:
+        return None
+    return inst, modes, tuple(program[pc+1:pc+length]), length
+
+# Analyze program, following control flow from pc 0 and from entries
+# (cached)
+def analyze(program, entries = ()):
+    entries = tuple(sorted(set(entries) - { 0 }))
+    key = (tuple(program), entries)
+    analysis = analysis_cache.get(key)
+    if analysis is None:
+        analysis = build_analysis(list(program), entries)
+        analysis_cache[key] = analysis
+    return analysis
+
+def build_analysis(program, entries):
+    analysis = Analysis(program)
+
+    # First pass: find every instruction reachable from the entries, and
+    # the addresses that start a block
+    leaders = { 0, *entries }
+    insts = { }
+    work = [ 0, *entries ]
+    while work:
+        pc = work.pop()
+        while pc not in insts:
+            decoded = decode_at(program, pc)
+            if decoded is None:
+                break
+            inst, modes, params, length = decoded
+            insts[pc] = decoded
+            next_pc = pc + length
+
+            if inst == 99:
+                break
+            if inst in (5, 6):
+                cond_known = modes[0] == IMM_MODE
+                taken = (params[0] != 0) == (inst == 5)
+                if (not cond_known or taken) and modes[1] == IMM_MODE:
+                    leaders.add(params[1])
+                    work.append(params[1])
+                leaders.add(next_pc)
+                if cond_known and taken:
+                    # Unconditional jump. If it's static, it may be a
+                    # call that returns to the next address.
+                    if modes[1] == IMM_MODE:
+                        work.append(next_pc)
+                    break
+            pc = next_pc
+
+    # Second pass: cut the instructions into blocks
+    for leader in sorted(leaders):
+        if leader not in insts:
+            continue
+        block = BasicBlock(leader)
+        pc = leader
+        while True:
+            inst, modes, params, length = insts[pc]
+            block.insts.append((pc, inst, modes, params))
+            analysis.code.update(range(pc, pc+length))
+            pc += length
+
+            if inst == 99:
+                break
+            if inst in (5, 6):
+                cond_known = modes[0] == IMM_MODE
+                taken = (params[0] != 0) == (inst == 5)
+                if not cond_known or taken:
+                    if modes[1] == IMM_MODE:
+                        if params[1] in insts:
+                            block.succs.append(params[1])
+                    else:
+                        block.indirect = True
+                if (not cond_known or not taken) and pc in insts:
+                    block.succs.append(pc)
+                break
+            if pc in leaders or pc not in insts:
+                if pc in insts:
+                    block.succs.append(pc)
+                break
+
+        block.end = pc
+        analysis.blocks[leader] = block
+
+    for block in analysis.blocks.values():
+        for succ in block.succs:
+            analysis.blocks[succ].preds.append(block.start)
+
+    # Stores to fixed addresses inside the code
+    for block in analysis.blocks.values():
+        for pc, inst, modes, params in block.insts:
+            if inst in write_insts:
+                idx = len(params) - 1
+                if modes[idx] != REL_MODE and params[idx] in analysis.code:
+                    analysis.patches.setdefault(params[idx], []).append(pc)
+
+    find_loops(analysis)
+    return analysis
+
+# Back edges of a depth-first walk of the CFG, starting from pc 0 and the
+# blocks nobody jumps to, then from any block not reached yet
+def find_loops(analysis):
+    blocks = analysis.blocks
+    state = { }                     # 1 = on the walk's stack, 2 = done
+    roots = [ b for b in sorted(blocks) if b == 0 or not blocks[b].preds ]
+    for root in roots + sorted(blocks):
+        if root in state:
+            continue
+        stack = [ (root, iter(blocks[root].succs)) ]
+        state[root] = 1
+        while stack:
+            start, succs = stack[-1]
+            succ = next(succs, None)
+            if succ is None:
+                state[start] = 2
+                stack.pop()
+            elif state.get(succ) == 1:
+                analysis.loops.append((start, succ))
+            elif succ not in state:
+                state[succ] = 1
+                stack.append((succ, iter(blocks[succ].succs)))
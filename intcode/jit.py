@@ -0,0 +1,195 @@
+"""Basic block compiler for the IntCode computer
+
+A basic block is a run of straight-line instructions (SUM, MULT, LT, EQU,
+REL) starting at some pc, optionally ending with a jump (JT, JF). The block
+stops in front of INP, OUT and END, which need the machine's input/output
+handling and are left to the interpreter.
+
+Each block is turned into Python source for a function
+
+    def block(m, rb):
+        ...
+        return next_pc, rb
+
+where m is the machine memory list and rb the relative base. Immediate
+operands become literals and position-mode operands inside the loaded image
+become direct list indexes, so a hot loop runs as a few generated functions
+instead of going through the interpreter's dispatch chain.
+
+Stores mark their memory page dirty and check the code map
+(machine.code_owners) like the interpreter does.
+A store into code invalidates the affected decoded instructions and blocks.
+If that dropped a block, the generated code returns right away, so the rest
+of the block, which may have just been overwritten, is never run stale. A
+store that has to grow memory also returns early and lets the machine's
+store() do the work.
+
+Intcode programs commonly patch the parameters of an upcoming instruction
+to index an array. Every address that has been written after being decoded
+is remembered in machine.volatile, and later compiles read such parameters
+from memory at run time instead of folding them into the source, so the
+block isn't thrown away on every patch. A volatile opcode ends the block in
+front of it, and the interpreter runs that instruction.
+
+Author: Tim Behrendsen
+"""
+
+from . import machine as intcode_machine
+
+MAX_BLOCK_INSTS = 100
+
+# Instructions that end a block before them (need interpreter I/O handling)
+STOP_INSTS = (3, 4, 99)
+
+# Compiled code objects shared between machines, keyed by block source. The
+# 50 NIC machines of Day 23, for example, all compile the same blocks.
+code_cache = { }
+
+# Build source for a function compiling the block at pc.
+#   Returns (source, code_addrs), where code_addrs are the addresses whose
+#   values were compiled into the source. source is None if pc starts at
+#   an instruction the interpreter must run itself.
+def block_source(machine, pc):
+    base_len = len(machine.base_memory)
+    volatile = machine.volatile
+    lines = [ "def block(m, rb):" ]
+    code_addrs = [ ]
+    tmp_count = 0
+
+    def new_tmp():
+        nonlocal tmp_count
+        tmp_count += 1
+        return f"t{tmp_count}"
+
+    # Parameter i of the instruction at cur: a literal, or a memory read
+    # if the program writes to that parameter. Returns (expr, is_const).
+    def param(cur, params, i):
+        addr = cur + i + 1
+        if addr not in volatile:
+            code_addrs.append(addr)
+            return repr(params[i]), True
+        if addr < base_len:
+            return f"m[{addr}]", False
+        return f"fetch({addr})", False
+
+    def read(mode, p):
+        expr, is_const = p
+        if mode == 1:                       # Immediate
+            return expr
+        if mode == 0 and is_const and 0 <= int(expr) < base_len:
+            return f"m[{expr}]"             # Always inside memory
+        a = new_tmp()
+        if mode == 0:
+            lines.append(f"    {a} = {expr}")
+        else:
+            lines.append(f"    {a} = rb + {expr}")
+        return f"(m[{a}] if 0 <= {a} < len(m) else fetch({a}))"
+
+    def write(mode, p, value, next_pc):
+        expr, _ = p
+        a = new_tmp()
+        if mode == 0:
+            lines.append(f"    {a} = {expr}")
+        else:
+            lines.append(f"    {a} = rb + {expr}")
+        lines.append(f"    if 0 <= {a} < len(m):")
+        lines.append(f"        m[{a}] = {value}")
+        lines.append(f"        dirty({a} >> {intcode_machine.PAGE_SHIFT})")
+        lines.append(f"        if {a} in owners and invalidate({a}):")
+        lines.append(f"            return {next_pc}, rb")
+        lines.append(f"    else:")
+        lines.append(f"        store({a}, {value})")
+        lines.append(f"        return {next_pc}, rb")
+
+    cur = pc
+    count = 0
+    while count < MAX_BLOCK_INSTS:
+        try:
+            inst, modes, params, length = machine.decode(cur)
+        except Exception:
+            # Not a valid instruction, so end the block here. If the
+            # program really runs into it, the interpreter reports it.
+            break
+
+        if inst in STOP_INSTS or cur in volatile:
+            break
+
+        next_pc = cur + length
+        count += 1
+        code_addrs.append(cur)
+        p = [ param(cur, params, i) for i in range(length-1) ]
+
+        if inst in (1, 2, 7, 8):
+            n1 = read(modes[0], p[0])
+            n2 = read(modes[1], p[1])
+            v = new_tmp()
+            if inst == 1:
+                lines.append(f"    {v} = {n1} + {n2}")
+            elif inst == 2:
+                lines.append(f"    {v} = {n1} * {n2}")
+            elif inst == 7:
+                lines.append(f"    {v} = 1 if {n1} < {n2} else 0")
+            else:
+                lines.append(f"    {v} = 1 if {n1} == {n2} else 0")
+            write(modes[2], p[2], v, next_pc)
+
+        elif inst == 9:
+            lines.append(f"    rb += {read(modes[0], p[0])}")
+
+        elif inst in (5, 6):
+            n = read(modes[0], p[0])
+            target = read(modes[1], p[1])
+            cmp = '!=' if inst == 5 else '=='
+            lines.append(f"    if {n} {cmp} 0:")
+            lines.append(f"        return {target}, rb")
+            lines.append(f"    return {next_pc}, rb")
+            return '\n'.join(lines), code_addrs
+
+        cur = next_pc
+
+    if count == 0:
+        return None, code_addrs
+
+    lines.append(f"    return {cur}, rb")
+    return '\n'.join(lines), code_addrs
+
+# Compile the block at pc for machine, and add it to the machine's block
+# cache. Returns the block function, or None if pc doesn't start a block
+# (cached as False, so the interpreter doesn't try again).
+def compile_block(machine, pc):
+    source, code_addrs = block_source(machine, pc)
+    if source is None:
+        # Rewriting the instruction at pc drops this entry as well
+        machine.block_cache[pc] = False
+        add_owner(machine.block_owners, pc, pc)
+        return None
+
+    code = code_cache.get(source)
+    if code is None:
+        code = compile(source, f"<intcode block {pc}>", 'exec')
+        code_cache[source] = code
+
+    namespace = {
+        'fetch': machine.fetch,
+        'store': machine.store,
+        'invalidate': machine.invalidate,
+        'owners': machine.code_owners,
+        'dirty': machine.dirty_pages.add,
+    }
+    exec(code, namespace)
+    block = namespace['block']
+
+    # Register the block's code so stores into it invalidate it
+    machine.block_cache[pc] = block
+    block_owners = machine.block_owners
+    for addr in code_addrs:
+        add_owner(block_owners, addr, pc)
+
+    return block
+
+def add_owner(owner_map, addr, pc):
+    owners = owner_map.get(addr)
+    if owners is None:
+        owner_map[addr] = { pc }
+    else:
+        owners.add(pc)
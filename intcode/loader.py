@@ -0,0 +1,98 @@
+"""IntCode program loader with an on-disk cache of parsed programs
+
+The puzzle input is one line of comma-separated numbers. load_program()
+parses it once and writes the result to __pycache__ next to the input, as
+a binary image named after a hash of the source, so a later run with the
+same input memory-maps the image and copies the values out in one call
+instead of parsing the text again.
+
+Image layout (native byte order):
+    MAGIC
+    int64 count, int64 big_count
+    count int64 values (0 in place of values that don't fit)
+    big_count lines of "index,value" for the values that don't fit
+
+Author: Tim Behrendsen
+"""
+
+import array
+import hashlib
+import mmap
+import os
+
+MAGIC = b'INTCODE\x01'
+CACHE_DIR = '__pycache__'
+INT64_MIN = -2**63
+INT64_MAX = 2**63 - 1
+
+# Read the program in fn, from the cache if possible
+def load_program(fn):
+    with open(fn, 'rb') as file:
+        source = file.readline().rstrip(b"\n")
+
+    digest = hashlib.sha1(source).hexdigest()[:16]
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(fn)), CACHE_DIR)
+    cache_fn = os.path.join(cache_dir, f"{os.path.basename(fn)}.{digest}.intcode")
+
+    program = read_image(cache_fn)
+    if program is None:
+        program = [ int(n) for n in source.split(b',') ]
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            write_image(cache_fn, program)
+        except OSError:
+            pass            # No cache, e.g. read-only directory
+
+    return program
+
+# Read a cached image. Returns None if there is no usable image: wrong
+# magic, or a size that doesn't match its header (e.g. a cut-off file).
+def read_image(cache_fn):
+    try:
+        with open(cache_fn, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = len(MAGIC) + 16
+            if len(mm) < start or mm[:len(MAGIC)] != MAGIC:
+                return None
+            with memoryview(mm) as view:
+                with view[len(MAGIC):start].cast('q') as header:
+                    count, big_count = header
+                end = start + count*8
+                if count < 0 or big_count < 0 or len(mm) < end:
+                    return None
+                with view[start:end].cast('q') as cells:
+                    program = cells.tolist()
+
+            lines = mm[end:].split()
+            if len(lines) != big_count:
+                return None
+            for line in lines:
+                idx, val = line.split(b',')
+                program[int(idx)] = int(val)
+            return program
+
+    except (OSError, ValueError, TypeError, IndexError):
+        return None
+
+# Write program as an image, via a temporary file so a concurrent reader
+# never sees a partial image
+def write_image(cache_fn, program):
+    big = [ (idx, val) for idx, val in enumerate(program) \
+        if val < INT64_MIN or val > INT64_MAX ]
+    cells = array.array('q', [ val if INT64_MIN <= val <= INT64_MAX else 0 for val in program ])
+
+    tmp_fn = f"{cache_fn}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_fn, 'wb') as file:
+            file.write(MAGIC)
+            file.write(array.array('q', [ len(program), len(big) ]).tobytes())
+            file.write(cells.tobytes())
+            file.write(b''.join(f"{idx},{val}\n".encode() for idx, val in big))
+        os.replace(tmp_fn, cache_fn)
+    except OSError:
+        # Don't leave a partial image behind
+        try:
+            os.unlink(tmp_fn)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,879 @@
+"""IntCode computer
+
+Memory is a flat list indexed by address. It starts as a copy of the
+program image and grows on demand when a program writes past the end, so
+relative-mode addresses well past the image still work. Reads past the end
+return 0 without growing. Values are ordinary Python ints, so results that
+overflow 64 bits need no special handling.
+
+For snapshots, memory is divided into pages of PAGE_SIZE cells and every
+store marks its page dirty. save_state() copies only the pages written
+since the last save or restore and shares the rest with the previous
+snapshot, and restore_state() rewrites only the pages that differ.
+
+Modes:
+    POS_MODE: parameter is a memory address
+    IMM_MODE: parameter is the actual value
+    REL_MODE: parameter is an offset from the relative base
+
+There are two interpreters behind run(). The normal one has no tracing at
+all and reads and writes the memory list directly. Passing a trace
+callback to the constructor selects a separate, slower interpreter that
+reports each instruction and memory access to it as a line of text
+(trace=print prints a full execution log).
+
+The normal interpreter also fuses common pairs of instructions into one
+superinstruction as it decodes them (see fuse()), such as a compare and
+the jump that tests its result, so a loop goes through the dispatch chain
+fewer times.
+
+Author: Tim Behrendsen
+"""
+
+import collections
+import queue
+import time
+
+from . import jit as jit_compiler
+from .profiler import Profile
+
+POS_MODE = 0
+IMM_MODE = 1
+REL_MODE = 2
+
+PAGE_SHIFT = 6
+PAGE_SIZE = 1 << PAGE_SHIFT
+DIFF_CHUNK = 8
+
+inst_list = { 1: 'SUM', 2: 'MULT', 3: 'INP', 4: 'OUT', 5: 'JT', 6: 'JF', 7: 'LT', 8: 'EQU', 9: 'REL', 99: 'END' }
+lengths = { 'SUM': 3, 'MULT': 3, 'INP': 1, 'OUT': 1, 'JT': 2, 'JF': 2, 'LT': 3, 'EQU': 3, 'REL': 1, 'END': 0 }
+
+# Instructions whose last parameter is the address written to
+write_insts = ( 1, 2, 3, 7, 8 )
+
+# Superinstructions, made by fuse() from common pairs of instructions
+CMP_JUMP = 100          # LT/EQU, then JT/JF on the cell it wrote
+ARITH_REL = 101         # SUM/MULT/LT/EQU, then REL with an immediate
+REL_JUMP = 102          # REL with an immediate, then JT/JF
+ARITH_PAIR = 103        # Two of SUM/MULT/LT/EQU
+
+class IntCode:
+    # yield_mode:
+    #       False = Run until END opcode
+    #       True  = Return result when output written to, continue when called again
+    # no_inp_block:
+    #       False = Stop if no input
+    #       True  = Return -1 in input instruction, if no input. A machine
+    #               that comes back to the same state at its next -1 poll
+    #               is idle, and is marked quiescent: run() returns right
+    #               away until input is added.
+    # jit:
+    #       False = Interpret each instruction
+    #       True  = Compile straight-line blocks into Python functions (see jit.py)
+    # trace:
+    #       None  = Run the fast interpreter
+    #       func  = Run the traced interpreter, calling func(line) for each
+    #               instruction and memory access (jit is ignored)
+    # threaded:
+    #       False = Input is a plain deque; with no input, INP stops the run
+    #               (unless no_inp_block), and the next run() retries it
+    #       True  = Input is a queue.Queue, and INP waits for another thread
+    #               to add input
+    # profile:
+    #       False = No profiling
+    #       True  = Collect execution counts and run times in self.profile
+    #               (see profiler.py; jit is ignored, and so is this with trace)
+    # fuse:
+    #       False = Run each instruction on its own
+    #       True  = Fuse common pairs of instructions (see fuse(); ignored
+    #               with trace or profile)
+    def __init__(self, yield_mode = False, no_inp_block = False, jit = False, trace = None,
+            threaded = False, profile = False, fuse = True):
+        self.memory = [ ]
+        self.base_memory = [ ]
+        self.pc = 0
+        self.rel_base = 0
+        self.yield_mode = yield_mode
+        self.threaded = threaded
+        self.input_queue = queue.Queue() if threaded else collections.deque()
+        self.no_inp_block = no_inp_block
+        self.jit = jit
+        self.trace = trace
+        self.profile = Profile() if profile else None
+        self.fuse_insts = fuse and trace is None and not profile
+        self.volatile = set()
+        self.dirty_pages = set()
+        self.saved_pages = { }
+        self.out_count = 0
+        self.clear_idle()
+        self.clear_decode_cache()
+
+    # Load program into memory and reset computer
+    def load(self, program):
+        self.base_memory = [ int(value) for value in program ]
+        self.memory = self.base_image()
+        self.pc = 0
+        self.rel_base = 0
+        self.volatile = set()
+        self.dirty_pages.clear()
+        self.saved_pages = { }
+        self.clear_idle()
+        self.clear_decode_cache()
+
+    # Reset the program to base state
+    #   Only pages written since load or reset are copied back from the
+    #   base image, and cached code that didn't change stays cached, so a
+    #   machine that is reset for every query (Day 19) only pays for what
+    #   each run touched.
+    def reset(self):
+        self.pc = 0
+        self.rel_base = 0
+        self.restore_pages({ })
+        self.clear_idle()
+
+    # Copy of the base image, padded to a whole number of pages
+    def base_image(self):
+        base = self.base_memory
+        return base + [ 0 ] * (-len(base) % PAGE_SIZE)
+
+    # Save state of program
+    #   Memory is saved as a dict of page number -> tuple of the page's
+    #   cells, holding the pages written since load or reset. Only the
+    #   pages dirtied since the last save or restore are copied; the other
+    #   tuples are shared with that snapshot, so forking many states costs
+    #   memory in proportion to what each one changed.
+    def save_state(self):
+        memory = self.memory
+        pages = self.saved_pages.copy()
+        for page in self.dirty_pages:
+            start = page << PAGE_SHIFT
+            pages[page] = tuple(memory[start:start+PAGE_SIZE])
+        self.dirty_pages.clear()
+        self.saved_pages = pages
+
+        return [ self.rel_base, self.pc, pages ]
+
+    def restore_state(self, state):
+        self.rel_base = state[0]
+        self.pc = state[1]
+        self.restore_pages(state[2])
+        self.clear_idle()
+        return
+
+    # Set memory to the base image plus pages. Rewrites the pages dirtied
+    # since the last save or restore, and the pages that aren't shared
+    # between that snapshot and this one.
+    def restore_pages(self, pages):
+        saved = self.saved_pages
+        changed = self.dirty_pages
+        for page in saved.keys() | pages.keys():
+            if saved.get(page) is not pages.get(page):
+                changed.add(page)
+
+        base = self.base_memory
+        for page in changed:
+            start = page << PAGE_SHIFT
+            new = pages.get(page)
+            if new is None:
+                new = base[start:start+PAGE_SIZE]
+                new += [ 0 ] * (PAGE_SIZE - len(new))
+            self.write_page(start, new)
+
+        changed.clear()
+        self.saved_pages = pages
+
+    # Overwrite the page starting at start with values, dropping cached
+    # code that changes
+    def write_page(self, start, values):
+        memory = self.memory
+        end = start + PAGE_SIZE
+        if end > len(memory):
+            self.grow(end - 1)
+        old = memory[start:end]
+        memory[start:end] = values
+        new = memory[start:end]
+        if old != new:
+            # Look for changed cells a chunk at a time
+            code_owners = self.code_owners
+            for i in range(0, PAGE_SIZE, DIFF_CHUNK):
+                if old[i:i+DIFF_CHUNK] != new[i:i+DIFF_CHUNK]:
+                    for addr in range(start+i, start+i+DIFF_CHUNK):
+                        if addr in code_owners and memory[addr] != old[addr-start]:
+                            self.invalidate(addr)
+
+    # Decode cache
+    #   decode_cache maps pc -> (inst, modes, params, length), so the run
+    #   loop doesn't take apart the opcode and gather parameters on every
+    #   execution. code_owners maps each address covered by a cached
+    #   instruction to the set of pcs whose entry it is part of, so a store
+    #   into code (self-modifying programs are legal) drops just the
+    #   affected entries.
+    #
+    #   block_cache and block_owners do the same for compiled blocks in jit
+    #   mode. Every address in block_owners is also in code_owners, since
+    #   the compiler decodes each instruction it compiles. volatile holds
+    #   the code addresses that have been written to, which the block
+    #   compiler reads at run time instead of compiling in.
+    def clear_decode_cache(self):
+        self.decode_cache = { }
+        self.code_owners = { }
+        self.block_cache = { }
+        self.block_owners = { }
+
+    def decode(self, pc):
+        entry = self.decode_entry(pc)
+        self.decode_cache[pc] = entry
+        self.add_owner(pc, pc, entry[3])
+        return entry
+
+    # Decode the instruction at pc, without caching it
+    def decode_entry(self, pc):
+        op = self.fetch(pc)
+        inst = op % 100
+        if inst not in inst_list:
+            raise Exception(f"Invalid op {inst} at {pc}")
+        length = lengths[inst_list[inst]] + 1
+        modes = ( (op // 100) % 10, (op // 1000) % 10, op // 10000 )
+        for mode in modes:
+            if mode not in (POS_MODE, IMM_MODE, REL_MODE):
+                raise Exception(f"invalid mode {mode}")
+        if inst in write_insts and modes[length-2] == IMM_MODE:
+            raise Exception(f"invalid mode {IMM_MODE}")
+        if pc + length <= len(self.memory):
+            params = tuple(self.memory[pc+1:pc+length])
+        else:
+            params = tuple(self.fetch(pc+i) for i in range(1, length))
+        return (inst, modes, params, length)
+
+    # Make the cached entry at pc an owner of length addresses from start
+    def add_owner(self, pc, start, length):
+        code_owners = self.code_owners
+        for addr in range(start, start+length):
+            owners = code_owners.get(addr)
+            if owners is None:
+                code_owners[addr] = { pc }
+            else:
+                owners.add(pc)
+
+    # Superinstructions
+    #   Combine the decoded instruction entry at pc with the one after it
+    #   when they make a pair that has a superinstruction, replacing the
+    #   cached entry. The result has the same shape as a decoded entry:
+    #
+    #       (CMP_JUMP, (m1, m2, m3, jump_mode),
+    #               (cmp_inst, n1, n2, addr, jump_if, target, cmp_length), length)
+    #       (ARITH_REL, (m1, m2, m3),
+    #               (arith_inst, n1, n2, addr, rel_offset, arith_length), length)
+    #       (REL_JUMP, (cond_mode, jump_mode),
+    #               (rel_offset, jump_if, cond, target), length)
+    #       (ARITH_PAIR, (m1, m2, m3, m4, m5, m6),
+    #               (inst1, n1, n2, addr1, inst2, n3, n4, addr2, length1), length)
+    #
+    #   where jump_if is True for JT and length covers both instructions.
+    #   pc becomes an owner of the second instruction too, so a store into
+    #   either half drops the superinstruction. A store by the first half
+    #   into code makes the interpreter carry on from the second half
+    #   instead.
+    def fuse(self, pc, entry):
+        inst, modes, params, length = entry
+        if inst not in (1, 2, 7, 8, 9):
+            return entry
+
+        next_pc = pc + length
+        try:
+            next_entry = self.decode_entry(next_pc)
+        except Exception:
+            return entry                # Not code (yet)
+        next_inst, next_modes, next_params, next_length = next_entry
+
+        if inst == 9:
+            if modes[0] != IMM_MODE or next_inst not in (5, 6):
+                return entry
+            fused = (REL_JUMP, next_modes[:2],
+                (params[0], next_inst == 5, *next_params), length + next_length)
+        elif (inst == 7 or inst == 8) and next_inst in (5, 6) \
+                and next_modes[0] == modes[2] and next_params[0] == params[2]:
+            fused = (CMP_JUMP, (*modes, next_modes[1]),
+                (inst, *params, next_inst == 5, next_params[1], length), length + next_length)
+        elif next_inst == 9 and next_modes[0] == IMM_MODE:
+            fused = (ARITH_REL, modes, (inst, *params, next_params[0], length), length + next_length)
+        elif next_inst in (1, 2, 7, 8):
+            fused = (ARITH_PAIR, (*modes, *next_modes),
+                (inst, *params, next_inst, *next_params, length), length + next_length)
+        else:
+            return entry
+
+        self.decode_cache[pc] = fused
+        self.add_owner(pc, next_pc, next_length)
+        return fused
+
+    # Drop decoded instructions and blocks that include addr. Returns True
+    # if a compiled block was dropped.
+    def invalidate(self, addr):
+        owners = self.code_owners.pop(addr, None)
+        if owners is None:
+            return False
+        self.volatile.add(addr)
+        for pc in owners:
+            self.decode_cache.pop(pc, None)
+
+        owners = self.block_owners.pop(addr, None)
+        if owners is None:
+            return False
+        for pc in owners:
+            self.block_cache.pop(pc, None)
+        return True
+
+    # Grow memory so that addr is valid. Grows at least by doubling, so
+    # a program walking upwards through memory doesn't copy on every store,
+    # and always to a whole number of pages.
+    def grow(self, addr):
+        memory = self.memory
+        new_len = max(addr + 1, len(memory) * 2)
+        new_len += -new_len % PAGE_SIZE
+        memory.extend([ 0 ] * (new_len - len(memory)))
+
+    # Fetch a memory location
+    def fetch(self, addr):
+        if addr < 0:
+            raise Exception(f"Invalid fetch: {addr}")
+        memory = self.memory
+        return memory[addr] if addr < len(memory) else 0
+
+    # Fetch a memory location with mode
+    def fetch_val(self, mode, val):
+        if mode == POS_MODE:            # Position mode, val = memory address
+            return self.fetch(val)
+        if mode == IMM_MODE:            # Immediate mode, val = actual value
+            return val
+        if mode == REL_MODE:            # Relative mode, val = offset from relative base
+            return self.fetch(val+self.rel_base)
+        raise Exception(f"invalid mode {mode}")
+
+    # Store at memory location
+    def store(self, addr, val):
+        if addr < 0:
+            raise Exception(f"Invalid store: {addr}")
+        if addr >= len(self.memory):
+            self.grow(addr)
+        self.memory[addr] = val
+        self.dirty_pages.add(addr >> PAGE_SHIFT)
+        if addr in self.code_owners:
+            self.invalidate(addr)
+
+    # Store at memory location with mode
+    def store_val(self, mode, addr, val):
+        if mode == POS_MODE:            # Position mode, val = memory address
+            pass
+        elif mode == REL_MODE:          # Relative mode, val = offset from relative base
+            addr = addr + self.rel_base
+        else:
+            raise Exception(f"invalid mode {mode}")
+
+        self.store(addr, val)
+        return addr
+
+    # Idle detection
+    #   poll_state is the state at the last -1 poll, with the number of
+    #   values output so far: (out_count, save_state()). If the next poll
+    #   finds the same, the program ran from that state back to it reading
+    #   only -1, and will keep doing that until it gets real input.
+    def clear_idle(self):
+        self.poll_state = None
+        self.quiescent = False
+
+    def check_idle(self, out_list):
+        poll_state = (self.out_count + len(out_list), self.save_state())
+        if poll_state == self.poll_state:
+            self.quiescent = True
+        self.poll_state = poll_state
+
+    def add_input(self, n):
+        self.clear_idle()
+        if self.threaded:
+            self.input_queue.put(n)
+        else:
+            self.input_queue.append(n)
+
+    def add_input_list(self, values):
+        self.clear_idle()
+        if self.threaded:
+            for n in values:
+                self.input_queue.put(n)
+        else:
+            self.input_queue.extend(values)
+
+    def add_input_str(self, s):
+        self.add_input_list(map(ord, s))
+
+    def inp_len(self):
+        if self.threaded:
+            return self.input_queue.qsize()
+        return len(self.input_queue)
+
+    def get_input(self):
+        if self.no_inp_block and self.inp_len() == 0:
+            return -1
+        if self.threaded:
+            return self.input_queue.get()
+        if not self.input_queue:
+            raise Exception("No input available")
+        return self.input_queue.popleft()
+
+
+    # Run program
+    #   Runs until END, or until the program needs input that isn't there.
+    #   count stops the run once that many values were output, and
+    #   sentinel once that value is output (e.g. 10, for a line of text);
+    #   yield_mode is the same as count=1, if neither is given. budget
+    #   stops the run after that many jump instructions (a compiled block
+    #   counts as one), so a long computation can be run in slices.
+    #
+    #   Returns (stopped, out_list), where stopped is 1 if the END opcode
+    #   was reached, 0 if the run was suspended (output count or sentinel,
+    #   budget, or no input available).
+    def run(self, count = None, sentinel = None, budget = None):
+        if self.quiescent:
+            return 0, [ ]
+        if count is None and sentinel is None and self.yield_mode:
+            count = 1
+        jumps = budget if budget is not None else -1
+        if self.trace is not None:
+            stopped, out_list = self.run_traced(count, sentinel, jumps)
+        elif self.profile is not None:
+            start = time.perf_counter()
+            stopped, out_list = self.run_fast(count, sentinel, jumps)
+            self.profile.add_run(time.perf_counter() - start, len(out_list))
+        else:
+            stopped, out_list = self.run_fast(count, sentinel, jumps)
+        self.out_count += len(out_list)
+        return stopped, out_list
+
+    # Fast interpreter. pc and rel_base are kept in locals and memory is
+    # indexed directly; only addresses outside the list go through fetch()
+    # and store(). Modes were checked by decode().
+    def run_fast(self, count, sentinel, jumps):
+        out_list = []
+        memory = self.memory
+        decode_cache = self.decode_cache
+        code_owners = self.code_owners
+        block_cache = self.block_cache
+        mark_dirty = self.dirty_pages.add
+        counts = self.profile.counts if self.profile is not None else None
+        hooked = self.jit or counts is not None
+        fetch = self.fetch
+        pc = self.pc
+        rel_base = self.rel_base
+
+        while True:
+            entry = decode_cache.get(pc)
+            if entry is None:
+                entry = self.decode(pc)
+                if self.fuse_insts:
+                    entry = self.fuse(pc, entry)
+            inst, modes, params, length = entry
+
+            # Count the instruction when profiling, or else run a compiled
+            # block, unless this is I/O or END
+            if hooked:
+                if counts is not None:
+                    key = (pc, inst)
+                    counts[key] = counts.get(key, 0) + 1
+                elif inst not in jit_compiler.STOP_INSTS:
+                    block = block_cache.get(pc)
+                    if block is None:
+                        block = jit_compiler.compile_block(self, pc)
+                    if block:
+                        pc, rel_base = block(memory, rel_base)
+                        jumps -= 1
+                        if jumps == 0:
+                            break
+                        continue
+
+            if inst == 1 or inst == 2 or inst == 7 or inst == 8:
+                m1, m2, m3 = modes
+                n1, n2, addr = params
+                if m1 != IMM_MODE:
+                    if m1 == REL_MODE:
+                        n1 += rel_base
+                    n1 = memory[n1] if 0 <= n1 < len(memory) else fetch(n1)
+                if m2 != IMM_MODE:
+                    if m2 == REL_MODE:
+                        n2 += rel_base
+                    n2 = memory[n2] if 0 <= n2 < len(memory) else fetch(n2)
+
+                if inst == 1:           # sum
+                    n = n1 + n2
+                elif inst == 2:         # mult
+                    n = n1 * n2
+                elif inst == 7:         # less-than
+                    n = 0 + (n1 < n2)
+                else:                   # Equal
+                    n = 0 + (n1 == n2)
+
+                if m3 == REL_MODE:
+                    addr += rel_base
+                if 0 <= addr < len(memory):
+                    memory[addr] = n
+                    mark_dirty(addr >> PAGE_SHIFT)
+                    if addr in code_owners:
+                        self.invalidate(addr)
+                else:
+                    self.store(addr, n)
+                pc += length
+
+            elif inst == CMP_JUMP:      # Compare, then jump on the result
+                m1, m2, m3, m4 = modes
+                cmp_inst, n1, n2, addr, jump_if, target, cmp_length = params
+                if m1 != IMM_MODE:
+                    if m1 == REL_MODE:
+                        n1 += rel_base
+                    n1 = memory[n1] if 0 <= n1 < len(memory) else fetch(n1)
+                if m2 != IMM_MODE:
+                    if m2 == REL_MODE:
+                        n2 += rel_base
+                    n2 = memory[n2] if 0 <= n2 < len(memory) else fetch(n2)
+                cond = n1 < n2 if cmp_inst == 7 else n1 == n2
+
+                if m3 == REL_MODE:
+                    addr += rel_base
+                if 0 <= addr < len(memory):
+                    memory[addr] = 0 + cond
+                    mark_dirty(addr >> PAGE_SHIFT)
+                    if addr in code_owners:
+                        self.invalidate(addr)
+                        pc += cmp_length
+                        continue
+                else:
+                    self.store(addr, 0 + cond)
+
+                if cond == jump_if:
+                    if m4 != IMM_MODE:
+                        if m4 == REL_MODE:
+                            target += rel_base
+                        target = memory[target] if 0 <= target < len(memory) else fetch(target)
+                    pc = target
+                else:
+                    pc += length
+                jumps -= 1
+                if jumps == 0:
+                    break
+
+            elif inst == ARITH_PAIR:    # Two of SUM/MULT/LT/EQU
+                m1, m2, m3, m4, m5, m6 = modes
+                inst1, n1, n2, addr, inst2, n3, n4, addr2, length1 = params
+                if m1 != IMM_MODE:
+                    if m1 == REL_MODE:
+                        n1 += rel_base
+                    n1 = memory[n1] if 0 <= n1 < len(memory) else fetch(n1)
+                if m2 != IMM_MODE:
+                    if m2 == REL_MODE:
+                        n2 += rel_base
+                    n2 = memory[n2] if 0 <= n2 < len(memory) else fetch(n2)
+
+                if inst1 == 1:
+                    n = n1 + n2
+                elif inst1 == 2:
+                    n = n1 * n2
+                elif inst1 == 7:
+                    n = 0 + (n1 < n2)
+                else:
+                    n = 0 + (n1 == n2)
+
+                if m3 == REL_MODE:
+                    addr += rel_base
+                if 0 <= addr < len(memory):
+                    memory[addr] = n
+                    mark_dirty(addr >> PAGE_SHIFT)
+                    if addr in code_owners:
+                        self.invalidate(addr)
+                        pc += length1
+                        continue
+                else:
+                    self.store(addr, n)
+
+                if m4 != IMM_MODE:
+                    if m4 == REL_MODE:
+                        n3 += rel_base
+                    n3 = memory[n3] if 0 <= n3 < len(memory) else fetch(n3)
+                if m5 != IMM_MODE:
+                    if m5 == REL_MODE:
+                        n4 += rel_base
+                    n4 = memory[n4] if 0 <= n4 < len(memory) else fetch(n4)
+
+                if inst2 == 1:
+                    n = n3 + n4
+                elif inst2 == 2:
+                    n = n3 * n4
+                elif inst2 == 7:
+                    n = 0 + (n3 < n4)
+                else:
+                    n = 0 + (n3 == n4)
+
+                if m6 == REL_MODE:
+                    addr2 += rel_base
+                if 0 <= addr2 < len(memory):
+                    memory[addr2] = n
+                    mark_dirty(addr2 >> PAGE_SHIFT)
+                    if addr2 in code_owners:
+                        self.invalidate(addr2)
+                else:
+                    self.store(addr2, n)
+                pc += length
+
+            elif inst == ARITH_REL:     # SUM/MULT/LT/EQU, then set relative base
+                m1, m2, m3 = modes
+                arith_inst, n1, n2, addr, offset, arith_length = params
+                if m1 != IMM_MODE:
+                    if m1 == REL_MODE:
+                        n1 += rel_base
+                    n1 = memory[n1] if 0 <= n1 < len(memory) else fetch(n1)
+                if m2 != IMM_MODE:
+                    if m2 == REL_MODE:
+                        n2 += rel_base
+                    n2 = memory[n2] if 0 <= n2 < len(memory) else fetch(n2)
+
+                if arith_inst == 1:
+                    n = n1 + n2
+                elif arith_inst == 2:
+                    n = n1 * n2
+                elif arith_inst == 7:
+                    n = 0 + (n1 < n2)
+                else:
+                    n = 0 + (n1 == n2)
+
+                if m3 == REL_MODE:
+                    addr += rel_base
+                if 0 <= addr < len(memory):
+                    memory[addr] = n
+                    mark_dirty(addr >> PAGE_SHIFT)
+                    if addr in code_owners:
+                        self.invalidate(addr)
+                        pc += arith_length
+                        continue
+                else:
+                    self.store(addr, n)
+                rel_base += offset
+                pc += length
+
+            elif inst == REL_JUMP:      # Set relative base, then jump
+                m1, m2 = modes
+                offset, jump_if, n, target = params
+                rel_base += offset
+                if m1 != IMM_MODE:
+                    if m1 == REL_MODE:
+                        n += rel_base
+                    n = memory[n] if 0 <= n < len(memory) else fetch(n)
+                if (n != 0) == jump_if:
+                    if m2 != IMM_MODE:
+                        if m2 == REL_MODE:
+                            target += rel_base
+                        target = memory[target] if 0 <= target < len(memory) else fetch(target)
+                    pc = target
+                else:
+                    pc += length
+                jumps -= 1
+                if jumps == 0:
+                    break
+
+            elif inst == 5 or inst == 6:    # Jump-if-true, Jump-if-false
+                m1, m2, _ = modes
+                n, target = params
+                if m1 != IMM_MODE:
+                    if m1 == REL_MODE:
+                        n += rel_base
+                    n = memory[n] if 0 <= n < len(memory) else fetch(n)
+                if (n != 0) == (inst == 5):
+                    if m2 != IMM_MODE:
+                        if m2 == REL_MODE:
+                            target += rel_base
+                        target = memory[target] if 0 <= target < len(memory) else fetch(target)
+                    pc = target
+                else:
+                    pc += length
+                jumps -= 1
+                if jumps == 0:
+                    break
+
+            elif inst == 9:           # Set relative base
+                n = params[0]
+                if modes[0] != IMM_MODE:
+                    if modes[0] == REL_MODE:
+                        n += rel_base
+                    n = memory[n] if 0 <= n < len(memory) else fetch(n)
+                rel_base += n
+                pc += length
+
+            elif inst == 3:           # input
+                addr = params[0]
+                if modes[0] == REL_MODE:
+                    addr += rel_base
+
+                if self.inp_len() == 0:
+                    # If no block mode and no current input, store -1 and yield
+                    if self.no_inp_block:
+                        self.store(addr, -1)
+                        self.pc, self.rel_base = pc + length, rel_base
+                        self.check_idle(out_list)
+                        if counts is not None:
+                            self.profile.input_waits += 1
+                        return 0, out_list
+
+                    # Otherwise wait at this instruction for more input
+                    if not self.threaded:
+                        self.pc, self.rel_base = pc, rel_base
+                        if counts is not None:
+                            self.profile.input_waits += 1
+                            # Runs again with input, so doesn't count yet
+                            key = (pc, inst)
+                            counts[key] -= 1
+                            if counts[key] == 0:
+                                del counts[key]
+                        return 0, out_list
+
+                self.store(addr, self.get_input())
+                pc += length
+
+            elif inst == 4:           # output
+                n = params[0]
+                if modes[0] != IMM_MODE:
+                    if modes[0] == REL_MODE:
+                        n += rel_base
+                    n = memory[n] if 0 <= n < len(memory) else fetch(n)
+                out_list.append(n)
+                pc += length
+                if n == sentinel or len(out_list) == count:
+                    self.pc, self.rel_base = pc, rel_base
+                    return 0, out_list
+
+            elif inst == 99:
+                self.pc, self.rel_base = pc, rel_base
+                return 1, out_list
+
+        # Out of budget
+        self.pc, self.rel_base = pc, rel_base
+        return 0, out_list
+
+    # Traced interpreter. Same semantics as run_fast(), but goes through
+    # fetch_val() and store_val() and reports everything to self.trace.
+    def run_traced(self, count, sentinel, jumps):
+        out_list = []
+        trace = self.trace
+        decode_cache = self.decode_cache
+
+        def fetch_val(mode, val):
+            n = self.fetch_val(mode, val)
+            if mode != IMM_MODE:
+                addr = val + self.rel_base if mode == REL_MODE else val
+                trace(f"    Fetch [{addr}] is {n}")
+            return n
+
+        def store_val(mode, addr, val):
+            addr = self.store_val(mode, addr, val)
+            trace(f"    Write to [{addr}] <- {val}")
+            return addr
+
+        while True:
+            pc = self.pc
+            entry = decode_cache.get(pc)
+            if entry is None:
+                entry = self.decode(pc)
+            inst, modes, params, length = entry
+
+            trace(f"{pc} {inst_list[inst]} ({modes}): {params}")
+
+            if inst == 1:             # sum
+                n1 = fetch_val(modes[0], params[0])
+                n2 = fetch_val(modes[1], params[1])
+                n = n1 + n2
+                addr = store_val(modes[2], params[2], n)
+                trace(f"    SUM: {n1} + {n2} = {n}, store at [{addr}]")
+                self.pc += length
+
+            elif inst == 2:           # mult
+                n1 = fetch_val(modes[0], params[0])
+                n2 = fetch_val(modes[1], params[1])
+                n = n1 * n2
+                addr = store_val(modes[2], params[2], n)
+                trace(f"    MULT: {n1} * {n2} = {n}, store at [{addr}]")
+                self.pc += length
+
+            elif inst == 3:           # input
+                trace(f"    get_input: len = {self.inp_len()}")
+
+                if self.inp_len() == 0:
+                    # If no block mode and no current input, store -1 and yield
+                    if self.no_inp_block:
+                        addr = store_val(modes[0], params[0], -1)
+                        self.pc += length
+                        self.check_idle(out_list)
+                        if self.quiescent:
+                            trace(f"    INP: idle loop, quiescent")
+                        return 0, out_list
+
+                    # Otherwise wait at this instruction for more input
+                    if not self.threaded:
+                        trace(f"    INP: waiting for input")
+                        return 0, out_list
+
+                n = self.get_input()
+                addr = store_val(modes[0], params[0], n)
+                trace(f"    INP: {n} store at [{addr}]")
+                self.pc += length
+
+            elif inst == 4:           # output
+                n = fetch_val(modes[0], params[0])
+                out_list.append(n)
+                trace(f"    OUT: {n} write from {params[0]}")
+                self.pc += length
+                if n == sentinel or len(out_list) == count:
+                    return 0, out_list
+
+            elif inst == 5:           # Jump-if-true
+                n = fetch_val(modes[0], params[0])
+                if n != 0:
+                    self.pc = fetch_val(modes[1], params[1])
+                    trace(f"    JT: {n}, jumping to {self.pc}")
+                else:
+                    trace(f"    JT: {n}, NO JUMP")
+                    self.pc += length
+
+            elif inst == 6:           # Jump-if-false
+                n = fetch_val(modes[0], params[0])
+                if n == 0:
+                    self.pc = fetch_val(modes[1], params[1])
+                    trace(f"    JF: {n}, jumping to {self.pc}")
+                else:
+                    trace(f"    JF: {n}, NO JUMP")
+                    self.pc += length
+
+            elif inst == 7:           # less-than
+                n1 = fetch_val(modes[0], params[0])
+                n2 = fetch_val(modes[1], params[1])
+                addr = store_val(modes[2], params[2], 0 + (n1 < n2))
+                trace(f"    LT: {n1} < {n2} = {n1 < n2}, store at [{addr}]")
+                self.pc += length
+
+            elif inst == 8:           # Equal
+                n1 = fetch_val(modes[0], params[0])
+                n2 = fetch_val(modes[1], params[1])
+                addr = store_val(modes[2], params[2], 0 + (n1 == n2))
+                trace(f"    EQ: {n1} == {n2}, is {n1 == n2}, store at [{addr}]")
+                self.pc += length
+
+            elif inst == 9:           # Set relative base
+                last = self.rel_base
+                self.rel_base += fetch_val(modes[0], params[0])
+                trace(f"    REL: Relative base set from {last} to {self.rel_base}")
+                self.pc += length
+
+            elif inst == 99:
+                break
+
+            if inst == 5 or inst == 6:
+                jumps -= 1
+                if jumps == 0:
+                    trace(f"    Out of budget")
+                    return 0, out_list
+
+        return 1, out_list
@@ -0,0 +1,83 @@
+"""Memoized runs of IntCode programs that are pure functions of their input
+
+Some programs are used like a function: load, give it a few inputs, run to
+END, read the outputs. Day 19's drone answers "is (x, y) in the beam?"
+that way, and the part 2 scan asks about many of the same points more than
+once. Memo wraps such a program as a callable, so that
+
+    beam = Memo(program)
+    beam(x, y)          # -> tuple of outputs
+
+only runs the program the first time it sees an input tuple; after that
+it's a dict lookup. Runs start from the loaded program each time (see
+batch.run_inputs()), so this is only correct for programs whose outputs
+depend on nothing but their inputs.
+
+Results are kept in a RunCache, keyed by (program hash, inputs), holding
+the size most recently used results. A RunCache can be shared by several
+Memos, even for different programs.
+
+Author: Tim Behrendsen
+"""
+
+import collections
+import hashlib
+
+from .machine import IntCode
+from .batch import run_inputs
+
+CACHE_SIZE = 4096
+
+# Least recently used cache of run results, with hit/miss counters
+class RunCache:
+    def __init__(self, size = CACHE_SIZE):
+        self.size = size
+        self.results = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def clear(self):
+        self.results.clear()
+        self.hits = 0
+        self.misses = 0
+
+    # Cached result for key, or None
+    def get(self, key):
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.results.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.results[key] = result
+        self.results.move_to_end(key)
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+# Hash of a program's contents, same as loader.load_program() uses for the
+# source line
+def program_digest(program):
+    return hashlib.sha1(','.join(map(str, program)).encode('ascii')).hexdigest()[:16]
+
+class Memo:
+    def __init__(self, program, cache = None, jit = True):
+        self.machine = IntCode(jit=jit)
+        self.machine.load(program)
+        self.digest = program_digest(program)
+        self.cache = cache if cache is not None else RunCache()
+
+    # Outputs of running the program with inputs, as a tuple
+    def __call__(self, *inputs):
+        key = (self.digest, inputs)
+        result = self.cache.get(key)
+        if result is None:
+            result = tuple(run_inputs(self.machine, inputs))
+            self.cache.put(key, result)
+        return result
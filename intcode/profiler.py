@@ -0,0 +1,124 @@
+"""Profiler for IntCode runs
+
+IntCode(profile=True) keeps a Profile in machine.profile, which counts
+every instruction executed by pc and opcode, how often the machine stopped
+to wait for input (or polled and got -1, with no_inp_block), and the
+number, total and longest wall time of the run() calls. Its size depends
+only on the program, not on how long it runs.
+
+Profiling isn't free: counting is one dict update per instruction, and
+the JIT and fused instructions are not used while profiling, since they
+have no per-instruction counts. Day 9 part 2 runs about twice as long
+profiled as on the plain interpreter.
+
+report() gives a flat text report. collapsed() gives the counts as
+collapsed stacks, one "intcode;block <start>;<pc> <inst> <count>" line per
+pc, grouped by the basic blocks from disasm.analyze(), which flamegraph
+tools (e.g. flamegraph.pl) turn into a picture of where the program
+spends its instructions.
+
+Author: Tim Behrendsen
+"""
+
+class Profile:
+    def __init__(self):
+        self.counts = { }           # (pc, inst) -> times executed
+        self.runs = 0               # run() calls
+        self.run_time = 0.0         # Wall time of all run() calls
+        self.longest_run = 0.0      # Wall time of the longest run() call
+        self.outputs = 0
+        self.input_waits = 0
+
+    def clear(self):
+        self.counts.clear()
+        self.runs = 0
+        self.run_time = 0.0
+        self.longest_run = 0.0
+        self.outputs = 0
+        self.input_waits = 0
+
+    # Called by the machine after each run() call
+    def add_run(self, seconds, outputs):
+        self.runs += 1
+        self.run_time += seconds
+        if seconds > self.longest_run:
+            self.longest_run = seconds
+        self.outputs += outputs
+
+    def total(self):
+        return sum(self.counts.values())
+
+    # Times executed, by pc
+    def pc_counts(self):
+        counts = { }
+        for (pc, inst), n in self.counts.items():
+            counts[pc] = counts.get(pc, 0) + n
+        return counts
+
+    # Times executed, by instruction name
+    def inst_counts(self):
+        from .machine import inst_list
+
+        counts = { }
+        for (pc, inst), n in self.counts.items():
+            name = inst_list[inst]
+            counts[name] = counts.get(name, 0) + n
+        return counts
+
+    # Flat text report, with the top pcs
+    def report(self, top = 20):
+        from .machine import inst_list
+
+        total = self.total()
+        run_time = self.run_time
+        lines = [ f"instructions: {total}",
+            f"run() calls: {self.runs}, {run_time:.6f}s, "
+                f"longest {self.longest_run:.6f}s",
+            f"outputs: {self.outputs}, input waits: {self.input_waits}" ]
+        if run_time > 0:
+            lines.append(f"instructions/s: {total / run_time:.0f}")
+
+        # Share of all instructions, as a percentage
+        def share(n):
+            return 100 * n / total if total > 0 else 0.0
+
+        lines.append("")
+        lines.append("by instruction:")
+        for name, n in sorted(self.inst_counts().items(), key=lambda item: -item[1]):
+            lines.append(f"  {name:4} {n:12} {share(n):6.2f}%")
+
+        lines.append("")
+        lines.append(f"top {top} pcs:")
+        hot = sorted(self.counts.items(), key=lambda item: -item[1])[:top]
+        for (pc, inst), n in hot:
+            lines.append(f"  {pc:5}: {inst_list[inst]:4} {n:12} {share(n):6.2f}%")
+        return lines
+
+    # Collapsed stack lines for flamegraph tools, with the counts grouped by
+    # the basic blocks of program
+    def collapsed(self, program):
+        from .machine import inst_list
+        from .disasm import analyze
+
+        # Pcs the static analysis didn't reach (patched jumps) are added as
+        # entries
+        analysis = analyze(program)
+        missed = { pc for pc, inst in self.counts if pc not in analysis.code }
+        if missed:
+            analysis = analyze(program, entries=missed)
+
+        block_of = { }
+        for block in analysis.blocks.values():
+            for pc, inst, modes, params in block.insts:
+                block_of[pc] = block.start
+
+        lines = []
+        for (pc, inst), n in sorted(self.counts.items()):
+            block = block_of.get(pc, pc)
+            lines.append(f"intcode;block {block};{pc} {inst_list[inst]} {n}")
+        return lines
+
+    def write_collapsed(self, fn, program):
+        with open(fn, 'w') as file:
+            for line in self.collapsed(program):
+                print(line, file=file)
@@ -0,0 +1,219 @@
+"""Conformance and speed suite for the IntCode backends
+
+Runs the puzzle programs of the IntCode days on each backend (see
+backends.py) and checks the answers against the known ones:
+
+    python -m intcode.suite                 # check every backend
+    python -m intcode.suite jit plain       # check just these
+    python -m intcode.suite bench [...]     # check, then time each case
+
+The Day 2 part 2 search is also run through run_batch() and run_many()
+(see batch.py), to check patched runs, result cells and the worker pool.
+
+The benchmark counts each case's instructions once with a profiling
+machine, then reports the best of REPEAT runs per backend in
+instructions per second. Only the time spent in run() counts, not
+building and loading the machines, and cases of fewer than BENCH_MIN_INSTS
+instructions are left out, since their runs are too short to time (and
+JIT compiles would dominate them).
+
+Author: Tim Behrendsen
+"""
+
+import itertools
+import os
+import sys
+import time
+
+from .backends import BACKENDS, new_machine
+from .batch import run_batch, run_many
+from .loader import load_program
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPEAT = 3
+
+BENCH_MIN_INSTS = 1000
+
+# Day 2: patch noun and verb, answer is memory[0]
+def run_gravity(make_machine, program, noun, verb):
+    program = list(program)
+    program[1] = noun
+    program[2] = verb
+    machine = make_machine()
+    machine.load(program)
+    machine.run()
+    return machine.fetch(0)
+
+# Days 5 and 9: one input, answer is the last output
+def run_diagnostic(make_machine, program, n):
+    machine = make_machine()
+    machine.load(program)
+    machine.add_input(n)
+    stopped, out_list = machine.run()
+    return out_list[-1]
+
+# Day 7: best signal from a chain of amplifiers over all phase orders,
+# fed back from the last to the first until it ends
+def run_amplifiers(make_machine, program, phases):
+    best = None
+    for order in itertools.permutations(phases):
+        amps = []
+        for phase in order:
+            machine = make_machine()
+            machine.load(program)
+            machine.add_input(phase)
+            amps.append(machine)
+
+        signal = 0
+        stopped = 0
+        while not stopped:
+            for machine in amps:
+                machine.add_input(signal)
+                stopped, out_list = machine.run()
+                signal = out_list[-1]
+
+        if best is None or signal > best:
+            best = signal
+    return best
+
+# Day 19: points of the 50x50 grid inside the beam
+def run_beam(make_machine, program):
+    machine = make_machine()
+    machine.load(program)
+    count = 0
+    for y in range(50):
+        for x in range(50):
+            machine.reset()
+            machine.add_input_list((x, y))
+            stopped, out_list = machine.run()
+            count += out_list[0]
+    return count
+
+# (name, day directory, function(make_machine, program), answer)
+CASES = [
+    ('Day 2 part 1', 'Day02', lambda mm, p: run_gravity(mm, p, 12, 2), 4023471),
+    ('Day 2 part 2', 'Day02', lambda mm, p: run_gravity(mm, p, 80, 51), 19690720),
+    ('Day 5 part 1', 'Day05', lambda mm, p: run_diagnostic(mm, p, 1), 13210611),
+    ('Day 5 part 2', 'Day05', lambda mm, p: run_diagnostic(mm, p, 5), 584126),
+    ('Day 7 part 1', 'Day07', lambda mm, p: run_amplifiers(mm, p, range(5)), 11828),
+    ('Day 7 part 2', 'Day07', lambda mm, p: run_amplifiers(mm, p, range(5, 10)), 1714298),
+    ('Day 9 part 1', 'Day09', lambda mm, p: run_diagnostic(mm, p, 1), 2204990589),
+    ('Day 9 part 2', 'Day09', lambda mm, p: run_diagnostic(mm, p, 2), 50008),
+    ('Day 19 part 1', 'Day19', run_beam, 116),
+]
+
+# Day 2 part 2: search for the noun and verb giving target, with runner
+# (run_batch or run_many), answer is 100 * noun + verb
+def search_gravity(runner, program, target, **kwargs):
+    pairs = [ (noun, verb) for noun in range(100) for verb in range(100) ]
+    runs = [ ({ 1: noun, 2: verb }, ()) for noun, verb in pairs ]
+    results = runner(program, runs, stop=lambda cells: cells[0] == target, cells=(0,), **kwargs)
+    if results[-1][0] != target:
+        return None
+    noun, verb = pairs[len(results)-1]
+    return noun * 100 + verb
+
+# (name, runner, runner options)
+BATCH_RUNNERS = [
+    ('run_batch', run_batch, { }),
+    ('run_many', run_many, { 'workers': 2 }),
+]
+
+def case_program(day):
+    return load_program(os.path.join(ROOT, day, 'program.dat'))
+
+# Check every case on backends. Returns the number of failures.
+def check(backends):
+    failures = 0
+    for name, day, func, answer in CASES:
+        program = case_program(day)
+        for backend in backends:
+            try:
+                result = func(lambda: new_machine(backend), program)
+            except Exception as e:
+                result = e
+            if result == answer:
+                print(f"{name:14} {backend:8} ok")
+            else:
+                print(f"{name:14} {backend:8} FAILED: got {result}, expected {answer}")
+                failures += 1
+
+    program = case_program('Day02')
+    for runner_name, runner, options in BATCH_RUNNERS:
+        try:
+            result = search_gravity(runner, program, 19690720, **options)
+        except Exception as e:
+            result = e
+        if result == 8051:
+            print(f"{'Day 2 search':14} {runner_name:9} ok")
+        else:
+            print(f"{'Day 2 search':14} {runner_name:9} FAILED: got {result}, expected 8051")
+            failures += 1
+    return failures
+
+# Instructions executed by a case
+def count_insts(func, program):
+    machines = []
+    def make_machine():
+        machine = new_machine(profile=True)
+        machines.append(machine)
+        return machine
+
+    func(make_machine, program)
+    return sum(machine.profile.total() for machine in machines)
+
+# Seconds a case spends in run() on backend, leaving out building and
+# loading its machines
+def time_runs(func, program, backend):
+    elapsed = 0.0
+    def make_machine():
+        machine = new_machine(backend)
+        run = machine.run
+        def timed_run(*args, **kwargs):
+            nonlocal elapsed
+            start = time.perf_counter()
+            result = run(*args, **kwargs)
+            elapsed += time.perf_counter() - start
+            return result
+        machine.run = timed_run
+        return machine
+
+    func(make_machine, program)
+    return elapsed
+
+def bench(backends):
+    print()
+    print(f"{'':14} {'insts':>10}" + ''.join(f" {backend:>12}" for backend in backends))
+    skipped = []
+    for name, day, func, answer in CASES:
+        program = case_program(day)
+        insts = count_insts(func, program)
+        if insts < BENCH_MIN_INSTS:
+            skipped.append(name)
+            continue
+        line = f"{name:14} {insts:10}"
+        for backend in backends:
+            best = min(time_runs(func, program, backend) for rep in range(REPEAT))
+            line += f" {insts / best:12.0f}"
+        print(line)
+    print(f"(instructions per second in run(), best of {REPEAT})")
+    if skipped:
+        print(f"(under {BENCH_MIN_INSTS} instructions, not timed: {', '.join(skipped)})")
+
+def main():
+    args = sys.argv[1:]
+    do_bench = 'bench' in args
+    backends = [ arg for arg in args if arg != 'bench' ] or list(BACKENDS)
+    for backend in backends:
+        if backend not in BACKENDS:
+            print(f"Unknown backend {backend}, have: {', '.join(BACKENDS)}")
+            return 2
+
+    failures = check(backends)
+    if failures == 0 and do_bench:
+        bench(backends)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())